@@ -1,19 +1,72 @@
+import functools
+import hashlib
+import os
+import tempfile
+
 import pyreadr
 import pandas as pd
 import numpy as np
+from typing import Callable, Optional, Tuple
+
+from utils import centered_rolling_mean, grouped_centered_rolling_mean, window_nanmean, grouped_window_nanmean, to_day_number, _as_c_f64, _as_c_days
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "resilience")
+_CACHE_VERSION = 3 # bump when load_and_process_data changes its output
 
+def _is_parquet(file_path: str) -> bool:
+    return os.path.splitext(file_path)[1].lower() in (".parquet", ".pq")
+
+def _parquet_cache(func: Callable[[str, str], pd.DataFrame]) -> Callable[[str, str], pd.DataFrame]:
+    """
+    Memoizes a (file_path, dataset) -> DataFrame loader to a Parquet file in CACHE_DIR.
+    The cache key covers the file's absolute path and modification time, so editing
+    or replacing the source file invalidates it.
+    """
+    @functools.wraps(func)
+    def wrapper(file_path: str, dataset: str) -> pd.DataFrame:
+        if _is_parquet(file_path):
+            return func(file_path, dataset) # already a fast columnar read
+        abs_path = os.path.abspath(file_path)
+        key = f"{_CACHE_VERSION}|{abs_path}|{os.path.getmtime(abs_path)}|{dataset}"
+        cache_path = os.path.join(CACHE_DIR, hashlib.sha1(key.encode()).hexdigest() + ".parquet")
+        if os.path.exists(cache_path):
+            return pd.read_parquet(cache_path, engine="pyarrow")
+
+        df = func(file_path, dataset)
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        # Write to a temp file and rename it into place, so an interrupted or concurrent
+        # write never leaves a truncated file at cache_path.
+        fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix=".parquet.tmp")
+        os.close(fd)
+        try:
+            df.to_parquet(tmp_path, engine="pyarrow", compression="zstd")
+            os.replace(tmp_path, cache_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        return df
+    return wrapper
+
+@_parquet_cache
 def load_and_process_data(file_path: str, dataset: str) -> pd.DataFrame:
     """
     Loads R data from the specified file path and performs initial processing.
-    This includes type conversions and date parsing.
+    This includes type conversions and date parsing. 'destination_cbg' is stored as a
+    sorted categorical index so that per-CBG lookups are index slices rather than scans.
+    Results are cached as Parquet in CACHE_DIR, so repeated runs skip the R parse.
+
+    A .parquet file written by convert_rdata_to_parquet is already processed and is read as is.
 
     Args:
-        file_path (str): The path to the .rdata file.
-        dataset (str): Specifies the name of the dataset in file.
+        file_path (str): The path to the .rdata (or converted .parquet) file.
+        dataset (str): Specifies the name of the dataset in file. Ignored for .parquet files.
 
     Returns:
-        pd.DataFrame: A processed pandas DataFrame.
+        pd.DataFrame: A processed pandas DataFrame indexed by 'destination_cbg'.
     """
+    if _is_parquet(file_path):
+        return pd.read_parquet(file_path, engine="pyarrow")
+
     result = pyreadr.read_r(file_path)
     df = result[dataset]
 
@@ -23,22 +76,44 @@ def load_and_process_data(file_path: str, dataset: str) -> pd.DataFrame:
     df["destination_device_count"] = pd.to_numeric(df["destination_device_count"], errors="coerce")
     df["year"] = df["year"].astype(int)
     df["uid"] = df["uid"].astype(int)
-    df["date"] = pd.to_datetime("2019-01-01") + pd.to_timedelta(df["uid"] - 1, unit="D") #
-    
+    uid = df["uid"].to_numpy(np.int64, copy=False)
+    df["date"] = (np.datetime64("2019-01-01", "D") + (uid - 1).astype("timedelta64[D]")).astype("datetime64[ns]") #
+    df["destination_cbg"] = df["destination_cbg"].astype("category")
+    df = df.set_index("destination_cbg").sort_index()
+
     return df
 
+def convert_rdata_to_parquet(rdata_path: str, dataset: str, parquet_path: str) -> None:
+    """
+    One-off conversion of an .rdata dataset to a processed Parquet file, which
+    load_and_process_data can then read directly instead of parsing the R file.
+
+    Args:
+        rdata_path (str): The path to the .rdata file.
+        dataset (str): Specifies the name of the dataset in file.
+        parquet_path (str): Where to write the Parquet file.
+    """
+    df = load_and_process_data(rdata_path, dataset)
+    df.to_parquet(
+        parquet_path,
+        engine="pyarrow",
+        compression="zstd",
+        use_dictionary=["destination_cbg", "origin_census_block_group"],
+        column_encoding={"uid": "DELTA_BINARY_PACKED"},
+    )
+
 def filter_by_cbg(df: pd.DataFrame, cbg: str) -> pd.DataFrame:
     """
     Filters the DataFrame for a specific destination census block group (CBG).
 
     Args:
-        df (pd.DataFrame): The input DataFrame.
+        df (pd.DataFrame): The input DataFrame, indexed by 'destination_cbg'.
         cbg (str): The destination census block group to filter by.
 
     Returns:
-        pd.DataFrame: A DataFrame containing data only for the specified CBG.
+        pd.DataFrame: A DataFrame containing data only for the specified CBG, with 'destination_cbg' as a column.
     """
-    return df[df['destination_cbg'] == cbg] #
+    return df.loc[[cbg]].reset_index() #
 
 def compute_indegree_by_destination(df: pd.DataFrame) -> pd.DataFrame:
     """
@@ -53,9 +128,9 @@ def compute_indegree_by_destination(df: pd.DataFrame) -> pd.DataFrame:
     Raises:
         Exception: If the dataset contains data for more than one CBG.
     """
-    if len(df['destination_cbg'].unique()) > 1:
+    if df['destination_cbg'].nunique(dropna=False) > 1:
         raise Exception("The Dataset has more than one CBG.")
-    grouped_indegree_df = df.groupby(["destination_cbg", "date"])["destination_device_count"].sum().reset_index() #
+    grouped_indegree_df = df.groupby(["destination_cbg", "date"], observed=True)["destination_device_count"].sum().reset_index() #
     grouped_indegree_df.rename(columns={"destination_device_count": "in_degree"}, inplace=True) #
     return grouped_indegree_df
 
@@ -70,42 +145,58 @@ def smoothen_data(df: pd.DataFrame, smoothing_period: int = 7) -> pd.DataFrame:
     Returns:
         pd.DataFrame: A DataFrame with the smoothed 'in_degree' column.
     """
-    df_smoothed = df.copy() #
-    df_smoothed["in_degree"] = ( #
-        df["in_degree"]
-        .rolling(window=smoothing_period, center=True, min_periods=1)
-        .mean()
-    )
-    df_smoothed["in_degree"] = ( #
-        df_smoothed["in_degree"]
-        .bfill()
-        .ffill()
-    )
-    return df_smoothed
+    return df.assign(in_degree=centered_rolling_mean(df["in_degree"].to_numpy(np.float64, copy=False), smoothing_period)) #
+
+def _baseline_window(disaster_start: pd.Timestamp, baseline_days_to_average_before_disaster: int) -> Tuple[pd.Timestamp, pd.Timestamp]:
+    """
+    Returns the (first, last) dates of the baseline window.
+    """
+    baseline_start = disaster_start - pd.Timedelta(days=baseline_days_to_average_before_disaster)
+    baseline_end = disaster_start - pd.Timedelta(days=1)
+    return baseline_start, baseline_end
 
 def calculate_baseline(df: pd.DataFrame, disaster_start: pd.Timestamp, baseline_days_to_average_before_disaster: int = 15) -> float:
     """
     Calculates the baseline 'in_degree' value by averaging data before the disaster start.
 
     Args:
-        df (pd.DataFrame): The input DataFrame with 'date' and 'in_degree' columns.
+        df (pd.DataFrame): The input DataFrame with 'date' and 'in_degree' columns, sorted by 'date'.
         disaster_start (pd.Timestamp): The start date of the disaster.
         baseline_days_to_average_before_disaster (int): Number of days before disaster_start to include in the baseline calculation.
 
     Returns:
         float: The calculated baseline value.
     """
-    baseline_start = disaster_start - pd.Timedelta(days=baseline_days_to_average_before_disaster)
-    baseline_end = disaster_start - pd.Timedelta(days=1)
+    baseline_start, baseline_end = _baseline_window(disaster_start, baseline_days_to_average_before_disaster)
 
-    baseline_df = df[ #
-        (df["date"] >= baseline_start) &
-        (df["date"] <= baseline_end)
-    ]
-    
-    baseline_value = baseline_df["in_degree"].mean()
+    # Same reduction as calculate_baselines, so single-CBG and batch runs agree to the last bit
+    baseline_value = window_nanmean(_as_c_f64(df["in_degree"]), _as_c_days(df["date"]),
+                                    to_day_number(baseline_start), to_day_number(baseline_end))
     return baseline_value
 
+def calculate_baselines(df: pd.DataFrame, disaster_start: pd.Timestamp, baseline_days_to_average_before_disaster: int = 15,
+                        bounds: Optional[Tuple[np.ndarray, np.ndarray]] = None) -> pd.Series:
+    """
+    Vectorized equivalent of calling calculate_baseline for every CBG in a long DataFrame.
+    Each CBG block is averaged over the shared baseline window with the same kernel as calculate_baseline.
+
+    Args:
+        df (pd.DataFrame): A DataFrame with 'destination_cbg', 'date' and 'in_degree' columns, sorted by CBG and
+                           then by date (e.g. from preprocess_all_cbgs).
+        disaster_start (pd.Timestamp): The start date of the disaster.
+        baseline_days_to_average_before_disaster (int): Number of days before disaster_start to include in the baseline calculation.
+        bounds (Optional[Tuple[np.ndarray, np.ndarray]]): (starts, stops) from cbg_bounds, if the caller already has them.
+
+    Returns:
+        pd.Series: The baseline value of each CBG in block order, indexed by 'destination_cbg'. NaN for CBGs with no data in the window.
+    """
+    baseline_start, baseline_end = _baseline_window(disaster_start, baseline_days_to_average_before_disaster)
+
+    starts, stops = cbg_bounds(df) if bounds is None else bounds
+    baselines = grouped_window_nanmean(_as_c_f64(df["in_degree"]), _as_c_days(df["date"]), starts, stops,
+                                       to_day_number(baseline_start), to_day_number(baseline_end))
+    return pd.Series(baselines, index=pd.Index(df["destination_cbg"].to_numpy()[starts], name="destination_cbg"), name="in_degree")
+
 def normalize_data(df: pd.DataFrame) -> pd.DataFrame:
     """
     Normalizes the 'in_degree' column of the DataFrame to a 0-1 scale.
@@ -116,14 +207,12 @@ def normalize_data(df: pd.DataFrame) -> pd.DataFrame:
     Returns:
         pd.DataFrame: A DataFrame with the normalized 'in_degree' column.
     """
-    df_normalized = df.copy() #
-    min_val = df["in_degree"].min() #
-    max_val = df["in_degree"].max() #
+    in_degree = df["in_degree"].to_numpy(np.float64, copy=False)
+    min_val = np.nanmin(in_degree) #
+    max_val = np.nanmax(in_degree) #
     if (max_val - min_val) == 0:
-        df_normalized["in_degree"] = 0 # Avoid division by zero if all values are the same
-    else:
-        df_normalized["in_degree"] = (df_normalized["in_degree"] - min_val) / (max_val - min_val) #
-    return df_normalized
+        return df.assign(in_degree=0) # Avoid division by zero if all values are the same
+    return df.assign(in_degree=(in_degree - min_val) / (max_val - min_val)) #
 
 def baseline_normalization(df: pd.DataFrame, baseline_value: float) -> pd.DataFrame:
     """
@@ -136,12 +225,9 @@ def baseline_normalization(df: pd.DataFrame, baseline_value: float) -> pd.DataFr
     Returns:
         pd.DataFrame: A DataFrame with the baseline-normalized 'in_degree' column.
     """
-    df_normalized = df.copy() #
     if baseline_value == 0: #
-        df_normalized['in_degree'] = np.nan #
-    else:
-        df_normalized['in_degree'] = (df_normalized['in_degree'] - baseline_value) / baseline_value #
-    return df_normalized
+        return df.assign(in_degree=np.nan) #
+    return df.assign(in_degree=(df['in_degree'].to_numpy(np.float64, copy=False) - baseline_value) / baseline_value) #
 
 def preprocess_data(df: pd.DataFrame, cbg: str, smoothing_period:int = 25) -> pd.DataFrame:
     """
@@ -155,4 +241,66 @@ def preprocess_data(df: pd.DataFrame, cbg: str, smoothing_period:int = 25) -> pd
     df_grouped = compute_indegree_by_destination(df_filtered)
     df_normalized = normalize_data(df_grouped)
     df_smoothed = smoothen_data(df_normalized, smoothing_period)
-    return df_smoothed
\ No newline at end of file
+    return df_smoothed
+
+def to_model_arrays(df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Extracts the preprocessed 'in_degree' and 'date' columns as contiguous arrays for the
+    array-based models (e.g. calculate_resilience_triangle_metrics).
+
+    Args:
+        df (pd.DataFrame): A preprocessed DataFrame sorted by 'date'.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: ('in_degree' as float64, 'date' as int64 day numbers).
+    """
+    return _as_c_f64(df["in_degree"]), _as_c_days(df["date"])
+
+def compute_indegree_all_cbgs(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Computes 'in_degree' for every destination CBG in a single groupby pass.
+
+    Args:
+        df (pd.DataFrame): The full input DataFrame, with 'destination_cbg' as an index level or column.
+
+    Returns:
+        pd.DataFrame: A long DataFrame with 'destination_cbg', 'date' and 'in_degree',
+                      sorted by CBG and date so that each CBG occupies a contiguous block of rows.
+    """
+    grouped_indegree_df = df.groupby(["destination_cbg", "date"], observed=True)["destination_device_count"].sum().reset_index()
+    grouped_indegree_df.rename(columns={"destination_device_count": "in_degree"}, inplace=True)
+    return grouped_indegree_df
+
+def preprocess_all_cbgs(df: pd.DataFrame, smoothing_period: int = 25) -> pd.DataFrame:
+    """
+    Vectorized equivalent of calling preprocess_data for every CBG in the df.
+    Normalization and smoothing are computed per CBG with groupby kernels instead of a Python loop.
+    :param smoothing_period: period for smoothing the 'in_degree' column.
+    :param df: input DataFrame
+    :return: preprocessed long DataFrame with 'destination_cbg', 'date' and 'in_degree'
+    """
+    df_grouped = compute_indegree_all_cbgs(df)
+    by_cbg = df_grouped.groupby("destination_cbg", sort=False, observed=True)["in_degree"]
+
+    in_degree = df_grouped["in_degree"].to_numpy(dtype=np.float64)
+    min_val = by_cbg.transform("min").to_numpy(dtype=np.float64)
+    span = by_cbg.transform("max").to_numpy(dtype=np.float64) - min_val
+    normalized = np.zeros_like(in_degree)
+    np.divide(in_degree - min_val, span, out=normalized, where=span != 0) # 0 where all values of a CBG are the same
+    df_grouped["in_degree"] = normalized
+
+    starts, stops = cbg_bounds(df_grouped)
+    df_grouped["in_degree"] = grouped_centered_rolling_mean(normalized, starts, stops, smoothing_period)
+    return df_grouped
+
+def cbg_bounds(df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the start and stop (exclusive) row positions of each CBG block in a df sorted by 'destination_cbg'.
+    """
+    cbgs = df["destination_cbg"]
+    cbgs = cbgs.cat.codes.to_numpy() if isinstance(cbgs.dtype, pd.CategoricalDtype) else cbgs.to_numpy()
+    if len(cbgs) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    starts = np.flatnonzero(np.r_[True, cbgs[1:] != cbgs[:-1]])
+    stops = np.r_[starts[1:], len(cbgs)]
+    return starts, stops
@@ -1,6 +1,8 @@
 import pandas as pd
 import numpy as np
 
+from utils import date_searchsorted
+
 def get_recovery_point_auc(df: pd.DataFrame, disaster_end: pd.Timestamp, threshold: float) -> pd.Timestamp:
     """
     Determines the recovery point for the AUC model.
@@ -9,24 +11,39 @@ def get_recovery_point_auc(df: pd.DataFrame, disaster_end: pd.Timestamp, thresho
     If no such point exists, it returns the date with the 'in_degree' closest to zero.
 
     Args:
-        df (pd.DataFrame): The DataFrame with baseline-normalized 'in_degree' and 'date'.
+        df (pd.DataFrame): The DataFrame with baseline-normalized 'in_degree' and 'date', sorted by 'date'.
         disaster_end (pd.Timestamp): The end date of the disaster.
         threshold (float): The threshold for 'in_degree' to consider as recovered.
 
     Returns:
         pd.Timestamp: The calculated recovery date.
     """
-    post_disaster_df = df[df["date"] > disaster_end].copy()
+    start = date_searchsorted(df["date"].to_numpy(), disaster_end, side="right")
 
-    if post_disaster_df.empty:
+    if start == len(df):
         return disaster_end
 
-    recovered_within_threshold = post_disaster_df[post_disaster_df["in_degree"].abs() <= threshold]
-    if not recovered_within_threshold.empty:
-        return recovered_within_threshold["date"].iloc[0]
+    post_disaster_abs = np.abs(df["in_degree"].to_numpy()[start:])
+    recovered_within_threshold = np.flatnonzero(post_disaster_abs <= threshold)
+    if recovered_within_threshold.size:
+        return df["date"].iat[start + recovered_within_threshold[0]]
+
+    return df["date"].iat[start + int(np.nanargmin(post_disaster_abs))]
+
+def compute_auc_daily(vals: np.ndarray) -> float:
+    """
+    Trapezoidal AUC of values sampled once per day, i.e. np.trapezoid(vals, dx=1.0)
+    reduced to a single sum.
 
-    closest_idx = post_disaster_df["in_degree"].abs().idxmin()
-    return df.loc[closest_idx, "date"]
+    Args:
+        vals (np.ndarray): Consecutive daily values.
+
+    Returns:
+        float: The calculated AUC. Returns 0.0 if there are less than 2 values.
+    """
+    if vals.size < 2:
+        return 0.0
+    return float(vals.sum() - 0.5 * (vals[0] + vals[-1]))
 
 def compute_auc_between_dates(df: pd.DataFrame, start_date: pd.Timestamp, end_date: pd.Timestamp) -> float:
     """
@@ -34,24 +51,26 @@ def compute_auc_between_dates(df: pd.DataFrame, start_date: pd.Timestamp, end_da
     using the trapezoidal rule.
 
     Args:
-        df (pd.DataFrame): The DataFrame with 'date' and 'in_degree' columns.
+        df (pd.DataFrame): The DataFrame with 'date' and 'in_degree' columns, sorted by 'date'.
         start_date (pd.Timestamp): The start date for AUC computation.
         end_date (pd.Timestamp): The end date for AUC computation.
 
     Returns:
         float: The calculated AUC. Returns 0.0 if the curve is empty or has less than 2 points.
     """
-    curve = df[(df["date"] >= start_date) & (df["date"] <= end_date)].copy()
+    dates = df["date"].to_numpy()
+    lo = date_searchsorted(dates, start_date, side="left")
+    hi = date_searchsorted(dates, end_date, side="right")
 
-    if curve.empty or len(curve) < 2:
+    if hi - lo < 2:
         return 0.0
 
-    curve = curve.sort_values(by='date')
-
-    curve = curve.set_index("date")
-    curve['days'] = (curve.index - curve.index.min()).days
-
-    area = np.trapezoid(curve["in_degree"], curve['days'])
+    vals = df["in_degree"].to_numpy()[lo:hi]
+    days = dates[lo:hi].astype("datetime64[D]").view(np.int64)
+    if days[-1] - days[0] == len(days) - 1: # one row per day, no gaps
+        area = compute_auc_daily(vals)
+    else:
+        area = np.trapezoid(vals, days)
 
     return area
 
@@ -106,7 +125,7 @@ def calculate_resilience_auc_metrics(
         }
 
     except Exception as e:
-        log_metrics["resilience_capacity"] = 0.0
+        log_metrics["resilience"] = 0.0
         log_metrics["recovery_point"] = None # Reset if error
         log_metrics["message"] = str(e)
         log_metrics["is_special_case"] = True
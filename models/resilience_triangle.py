@@ -1,130 +1,140 @@
+import numpy as np
 import pandas as pd
-from typing import Tuple, Optional
+from numba import njit, prange
 
-from utils import get_relative_points, calculate_triangle_area, get_area_under_baseline, calculate_slope
+from utils import nearest_index, nanargmin_range, nanargmax_range, to_day_number, from_day_number, _calculate_slope_nb, _triangle_area_nb, _area_under_baseline_nb
 
 
-def calculate_disaster_start_point(df: pd.DataFrame, disaster_start: pd.Timestamp) -> Tuple[pd.Timestamp, float]:
-    """
-    Calculates the point representing the start of the disaster (t0).
+_OK = 0
+_NO_RECOVERY_POINT = 1
+_EMPTY_IMPACT_RANGE = 2
+_ABOVE_BASELINE = 3
+_WENT_UP = 4
+_NO_DATA = 5
 
-    Args:
-        df (pd.DataFrame): The DataFrame with normalized 'in_degree' and 'date'.
-        disaster_start (pd.Timestamp): The actual start date of the disaster.
+_KERNEL_MESSAGES = {
+    _NO_RECOVERY_POINT: "No valid mobility observed after the disaster end.",
+    _EMPTY_IMPACT_RANGE: "No observations between disaster start and recovery.",
+    _ABOVE_BASELINE: "The mobility never went down the baseline during disaster. Abnormal pattern.",
+    _WENT_UP: "The mobility went up during disaster. Abnormal pattern",
+    _NO_DATA: "No data available for the CBG.",
+}
 
-    Returns:
-        Tuple[pd.Timestamp, float]: A tuple (t0_date, t0_value).
+@njit(cache=True)
+def _recovery_point(in_degree: np.ndarray, dates: np.ndarray, end_day: int, baseline: float):
     """
-
-    t0_row = df[df["date"] == disaster_start]
-    if t0_row.empty:
-        t0_value = df.loc[df['date'].sub(disaster_start).abs().idxmin()]['in_degree']
-        t0 = df.loc[df['date'].sub(disaster_start).abs().idxmin()]['date']
-    else:
-        t0 = disaster_start
-        t0_value = t0_row["in_degree"].iloc[0]
-    return t0, t0_value
-
-def calculate_disaster_end_point(df: pd.DataFrame, disaster_end: pd.Timestamp) -> Tuple[pd.Timestamp, float]:
-    """
-    Calculates the point representing the end of the disaster.
-
-    Args:
-        df (pd.DataFrame): The DataFrame with normalized 'in_degree' and 'date'.
-        disaster_end (pd.Timestamp): The actual end date of the disaster.
+    Recovery point (t1): the first value back at the baseline after the disaster end, otherwise
+    (new normal) the peak after the post-disaster low.
 
     Returns:
-        Tuple[pd.Timestamp, float]: A tuple (inactive_date, inactive_value).
+        tuple: (status, t1_idx, t1_day, t1_value, recovered). t1_idx is -1 and t1_day is end_day
+               when there is no data on or after end_day; status is _NO_RECOVERY_POINT when
+               all of that data is NaN.
     """
-    inactive_row = df[df["date"] == disaster_end]
-    if inactive_row.empty:
-        inactive_value = df.loc[df['date'].sub(disaster_end).abs().idxmin()]['in_degree']
-        inactive = df.loc[df['date'].sub(disaster_end).abs().idxmin()]['date']
-    else:
-        inactive = disaster_end
-        inactive_value = inactive_row["in_degree"].iloc[0]
-    return inactive, inactive_value
-
-def calculate_recovery_point(df_normalized: pd.DataFrame, disaster_end: pd.Timestamp, baseline_value: float) -> Tuple[Tuple[pd.Timestamp, float], bool]:
+    n = dates.shape[0]
+    start = np.searchsorted(dates, end_day)
+    if start == n:
+        return _OK, -1, end_day, 0.0, False
+    for j in range(start, n):
+        if in_degree[j] >= baseline:
+            return _OK, j, dates[j], in_degree[j], True
+    min_idx = nanargmin_range(in_degree, start, n)
+    if min_idx < 0:
+        return _NO_RECOVERY_POINT, -1, end_day, 0.0, False
+    t1_idx = nanargmax_range(in_degree, min_idx, n)
+    t1_value = baseline if t1_idx == min_idx else in_degree[t1_idx]
+    return _OK, t1_idx, dates[t1_idx], t1_value, False
+
+@njit(cache=True)
+def _systematic_impact_point(in_degree: np.ndarray, dates: np.ndarray, baseline: float, t0_day: int, t1_day: int):
     """
-    Calculates the recovery point (t1) or the new normal point if full recovery isn't achieved.
-
-    Args:
-        df_normalized (pd.DataFrame): The DataFrame with normalized 'in_degree' and 'date'.
-        disaster_end (pd.Timestamp): The end date of the disaster.
-        baseline_value (float): The calculated baseline 'in_degree' value.
+    Systematic impact point (tD): the low point between t0 and t1.
 
     Returns:
-        Tuple[Tuple[pd.Timestamp, float], bool]: A tuple containing:
-            - (t1_date, t1_value) representing the recovery/new normal point.
-            - A boolean indicating whether full recovery was achieved (True) or a new normal formed (False).
+        tuple: (status, tD_idx). status is _EMPTY_IMPACT_RANGE if there are no observations in
+               [t0, t1], _ABOVE_BASELINE if the low never drops below the baseline and _WENT_UP
+               if the low is t0 itself. tD_idx is -1 for an empty range.
     """
-    post_disaster_df = df_normalized[df_normalized["date"] >= disaster_end].copy()
-
-    if post_disaster_df.empty:
-        return (disaster_end, 0.0), False
-
-    post_disaster_df = post_disaster_df.sort_values(by='date')
-
-    recovery_df = post_disaster_df[post_disaster_df["in_degree"] >= baseline_value]
-
-    if not recovery_df.empty:
-        t1 = recovery_df["date"].iloc[0]
-        t1_value = recovery_df["in_degree"].iloc[0]
-        recover = True
-    else:
-        min_point = post_disaster_df["in_degree"].min()
-        min_date = post_disaster_df[post_disaster_df["in_degree"] == min_point]["date"].iloc[0]
-        tail_df = post_disaster_df[post_disaster_df["date"] >= min_date]
-        
-        if not tail_df.empty:
-            t1_value = tail_df["in_degree"].max()
-            t1 = tail_df[tail_df["in_degree"] == t1_value]["date"].iloc[0]
-            if t1 == min_date:
-                t1_value = baseline_value
-        else:
-            t1 = post_disaster_df['date'].iloc[-1] # Last available date
-            t1_value = post_disaster_df['in_degree'].iloc[-1]
-        recover = False
-
-    return (t1, t1_value), recover
-
-def calculate_systematic_impact_point(df_normalized: pd.DataFrame, baseline: float, t0: pd.Timestamp, t1: pd.Timestamp) -> Tuple[pd.Timestamp, float]:
+    lo = np.searchsorted(dates, t0_day, side="left")
+    hi = np.searchsorted(dates, t1_day, side="right")
+    tD_idx = nanargmin_range(in_degree, lo, hi)
+    if tD_idx < 0:
+        return _EMPTY_IMPACT_RANGE, -1
+    if in_degree[tD_idx] >= baseline:
+        return _ABOVE_BASELINE, tD_idx
+    if dates[tD_idx] == t0_day:
+        return _WENT_UP, tD_idx
+    return _OK, tD_idx
+
+@njit(cache=True)
+def _triangle_kernel(in_degree: np.ndarray, dates: np.ndarray, baseline: float, start_day: int, end_day: int):
     """
-    Calculates the systematic impact point (tD), which is the minimum point
-    in 'in_degree' between t0 and t1.
-
-    Args:
-        df_normalized (pd.DataFrame): The DataFrame with normalized 'in_degree' and 'date'.
-        baseline (float): The baseline 'in_degree' value.
-        t0 (pd.Timestamp): The disaster start date (t0).
-        t1 (pd.Timestamp): The recovery/new normal date (t1).
+    All Resilience Triangle steps for one CBG - t0, t_inactive, t1 and tD, then the triangle
+    area and slopes - run over its arrays without any intermediate allocations.
 
     Returns:
-        Tuple[pd.Timestamp, float]: A tuple (tD_date, tD_value).
-
-    Raises:
-        Exception: If the range between t0 and t1 is zero, or if no value
-                   below the baseline is observed (tD_value >= baseline).
+        tuple: (status, t0_idx, inactive_idx, t1_idx, t1_day, t1_value, recovered, tD_idx,
+                resilience, robustness, vulnerability). status is _OK or one of the error
+                codes in _KERNEL_MESSAGES; fields past the failing step are undefined.
+                t1_idx is -1 when there is no data on or after end_day.
     """
-    
-    in_recovery_df = df_normalized[(df_normalized["date"] >= t0) & (df_normalized["date"] <= t1)]
-
-    tD_value = in_recovery_df["in_degree"].min()
-
-    if tD_value >= baseline:
-        raise Exception("The mobility never went down the baseline during disaster. Abnormal pattern.")
-
-    tD = in_recovery_df[in_recovery_df["in_degree"] == tD_value]["date"].iloc[0]
-    tD = pd.to_datetime(tD)
-
-    if tD == t0:
-        raise Exception("The mobility went up during disaster. Abnormal pattern")
-    
-    return tD, tD_value
+    n = dates.shape[0]
+    if n == 0:
+        return _NO_DATA, -1, -1, -1, end_day, 0.0, False, -1, 0.0, 0.0, 0.0
+    t0_idx = nearest_index(dates, start_day)
+    inactive_idx = nearest_index(dates, end_day)
+    t0_day = dates[t0_idx]
+
+    status, t1_idx, t1_day, t1_value, recovered = _recovery_point(in_degree, dates, end_day, baseline)
+    if status != _OK:
+        return status, t0_idx, inactive_idx, -1, end_day, 0.0, False, -1, 0.0, 0.0, 0.0
+
+    status, tD_idx = _systematic_impact_point(in_degree, dates, baseline, t0_day, t1_day)
+    if status != _OK:
+        return status, t0_idx, inactive_idx, t1_idx, t1_day, t1_value, recovered, tD_idx, 0.0, 0.0, 0.0
+
+    # Triangle (t0, tD, t1) in days relative to t0, the area under the baseline and the slopes.
+    t0_value = in_degree[t0_idx]
+    tD_value = in_degree[tD_idx]
+    x_tD = float(dates[tD_idx] - t0_day)
+    x_t1 = float(t1_day - t0_day)
+    triangle_area = _triangle_area_nb(0.0, t0_value, x_tD, tD_value, x_t1, t1_value)
+    dab_area = _area_under_baseline_nb(x_t1, baseline)
+    resilience = 0.0 if dab_area == 0 else (triangle_area / dab_area) * 100
+
+    robustness = _calculate_slope_nb(x_t1, t1_value, x_tD, tD_value)
+    vulnerability = _calculate_slope_nb(x_tD, tD_value, 0.0, t0_value)
+
+    return _OK, t0_idx, inactive_idx, t1_idx, t1_day, t1_value, recovered, tD_idx, resilience, robustness, vulnerability
+
+# recovery_status labels indexed by 0 = new normal, 1 = recovered, 2 = special case
+_RECOVERY_STATUS_LABELS = np.array(["New normal", "Recovered", "No Trend Shown"], dtype=object)
+
+@njit(parallel=True, cache=True)
+def _batch_triangle_kernel(in_degree, dates, starts, stops, baselines, start_day, end_day):
+    """
+    Runs _triangle_kernel over many CBGs in parallel. CBG c owns rows [starts[c], stops[c]).
+    """
+    n_cbg = starts.shape[0]
+    status = np.empty(n_cbg, dtype=np.int64)
+    recovered = np.zeros(n_cbg, dtype=np.bool_)
+    resilience = np.zeros(n_cbg, dtype=np.float64)
+    robustness = np.zeros(n_cbg, dtype=np.float64)
+    vulnerability = np.zeros(n_cbg, dtype=np.float64)
+    for c in prange(n_cbg):
+        lo, hi = starts[c], stops[c]
+        result = _triangle_kernel(in_degree[lo:hi], dates[lo:hi], baselines[c], start_day, end_day)
+        status[c] = result[0]
+        if result[0] == _OK:
+            recovered[c] = result[6]
+            resilience[c] = result[8]
+            robustness[c] = result[9]
+            vulnerability[c] = result[10]
+    return status, recovered, resilience, robustness, vulnerability
 
 def calculate_resilience_triangle_metrics(
-    df: pd.DataFrame,
+    in_degree: np.ndarray,
+    dates: np.ndarray,
     baseline: float,
     disaster_start: pd.Timestamp,
     disaster_end: pd.Timestamp,
@@ -135,7 +145,8 @@ def calculate_resilience_triangle_metrics(
     Args:
         :param disaster_end: (pd.Timestamp): The end date of the disaster.
         :param disaster_start: (pd.Timestamp): The start date of the disaster.
-        :param df: The full dataset.
+        :param in_degree: normalized 'in_degree' values as a contiguous float64 array.
+        :param dates: matching dates as sorted int64 day numbers (see data_processing.to_model_arrays).
         :param baseline: has baseline value.
 
     Returns:
@@ -165,35 +176,37 @@ def calculate_resilience_triangle_metrics(
 
     try:
 
-        point_t0 = calculate_disaster_start_point(df, disaster_start)
+        (status, t0_idx, inactive_idx, t1_idx, t1_day, t1_value, recovered, tD_idx,
+         resilience, robustness, vulnerability) = _triangle_kernel(
+            in_degree, dates, baseline, to_day_number(disaster_start), to_day_number(disaster_end)
+        )
+        if status == _NO_DATA:
+            raise Exception(_KERNEL_MESSAGES[status])
+
+        point_t0 = (from_day_number(dates[t0_idx]), in_degree[t0_idx])
         log_metrics["point_t0"] = point_t0[0]
 
-        point_inactive = calculate_disaster_end_point(df, disaster_end)
+        point_inactive = (from_day_number(dates[inactive_idx]), in_degree[inactive_idx])
         log_metrics["point_inactive"] = point_inactive[0]
 
-        point_t1, recovered = calculate_recovery_point(df, disaster_end, baseline)
+        if status == _NO_RECOVERY_POINT:
+            raise Exception(_KERNEL_MESSAGES[status])
+        point_t1 = (from_day_number(t1_day), t1_value)
         log_metrics["point_t1"] = point_t1[0]
         log_metrics["recovery_status"] = "Recovered" if recovered else "New normal"
 
-        point_tD = calculate_systematic_impact_point(df, baseline, point_t0[0], point_t1[0])
+        if status != _OK:
+            raise Exception(_KERNEL_MESSAGES[status])
+        point_tD = (from_day_number(dates[tD_idx]), in_degree[tD_idx])
         log_metrics["point_tD"] = point_tD[0]
 
+        log_metrics["resilience"] = resilience
+        log_metrics["robustness"] = robustness
+        log_metrics["vulnerability"] = vulnerability
+
         rpoint_t0 = (point_t0[0], point_t0[1])
         rpoint_tD = (point_tD[0], point_tD[1])
         rpoint_t1 = (point_t1[0], point_t1[1])
-        
-        relative_t0, relative_tD, relative_t1 = get_relative_points(point_t0, point_tD, point_t1)
-
-        triangle_area = calculate_triangle_area(relative_t0, relative_tD, relative_t1)
-        dab_area = get_area_under_baseline(baseline, point_t0[0], point_t1[0])
-
-        if dab_area == 0:
-             log_metrics["resilience"] = 0.0
-        else:
-            log_metrics["resilience"] = (triangle_area / dab_area) * 100
-
-        log_metrics["robustness"] = calculate_slope(rpoint_t1, rpoint_tD)
-        log_metrics["vulnerability"] = calculate_slope(rpoint_tD, rpoint_t0)
 
         graph_metrics["triangle_coordinates"] = rpoint_t0, rpoint_tD, rpoint_t1
         graph_metrics["dab_region"] = rpoint_t0[0], rpoint_t1[0]
@@ -215,4 +228,49 @@ def calculate_resilience_triangle_metrics(
         graph_metrics["critical_show"] = False
         graph_metrics["fill_dab"] = False
 
-    return log_metrics, graph_metrics
\ No newline at end of file
+    return log_metrics, graph_metrics
+
+def calculate_resilience_triangle_metrics_batch(
+    in_degree: np.ndarray,
+    dates: np.ndarray,
+    starts: np.ndarray,
+    stops: np.ndarray,
+    baselines: np.ndarray,
+    disaster_start: pd.Timestamp,
+    disaster_end: pd.Timestamp,
+) -> dict:
+    """
+    Calculates the Resilience Triangle metrics for many CBGs at once, in parallel across cores.
+
+    Args:
+        :param in_degree: normalized 'in_degree' values of all CBGs, as a contiguous float64 array.
+        :param dates: matching dates as int64 day numbers, sorted within each CBG.
+        :param starts: first row of each CBG (see data_processing.cbg_bounds).
+        :param stops: row after the last row of each CBG.
+        :param baselines: baseline value of each CBG.
+        :param disaster_start: (pd.Timestamp): The start date of the disaster.
+        :param disaster_end: (pd.Timestamp): The end date of the disaster.
+
+    Returns:
+        dict: Arrays with one entry per CBG - "resilience", "robustness", "vulnerability",
+              "recovery_status" and "is_special_case". Special cases have zero metrics and
+              status "No Trend Shown", as in calculate_resilience_triangle_metrics.
+    """
+    status, recovered, resilience, robustness, vulnerability = _batch_triangle_kernel(
+        in_degree, dates,
+        np.asarray(starts, dtype=np.int64), np.asarray(stops, dtype=np.int64),
+        np.asarray(baselines, dtype=np.float64),
+        to_day_number(disaster_start), to_day_number(disaster_end)
+    )
+    is_special_case = status != _OK
+    status_codes = recovered.astype(np.intp)
+    status_codes[is_special_case] = 2
+    recovery_status = _RECOVERY_STATUS_LABELS[status_codes]
+
+    return {
+        "resilience": resilience,
+        "robustness": robustness,
+        "vulnerability": vulnerability,
+        "recovery_status": recovery_status,
+        "is_special_case": is_special_case,
+    }
\ No newline at end of file
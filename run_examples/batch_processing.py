@@ -10,26 +10,27 @@ def run_batch_processing():
 
     df = load_and_process_data(PATH, dataset)
 
-    all_cbgs = list(df['destination_cbg'].unique())
+    preprocess_df = preprocess_all_cbgs(df)
+    in_degree, dates = to_model_arrays(preprocess_df)
+    starts, stops = cbg_bounds(preprocess_df)
+    all_cbgs = preprocess_df["destination_cbg"].to_numpy()[starts]
     print("Total no. of cbgs - ", len(all_cbgs))
 
-    all_cbg_resilience = {"CBG": [], "Resilience": [], "Robustness": [], "Vulnerability": [], "Status": []}
+    baselines = calculate_baselines(preprocess_df, disaster_start, bounds=(starts, stops)).to_numpy(np.float64)
+    metrics = calculate_resilience_triangle_metrics_batch(in_degree, dates, starts, stops, baselines, disaster_start, disaster_end)
 
-    special_count = 0
-
-    for cbg in all_cbgs:
-        print("Processing cbg", cbg)
-        preprocess_df = preprocess_data(df, cbg)
-        basline_value = calculate_baseline(preprocess_df, disaster_start)
-        log_metrics, _ = calculate_resilience_triangle_metrics(preprocess_df, basline_value, disaster_start, disaster_end)
-        if log_metrics["is_special_case"]:
+    for cbg, is_special_case in zip(all_cbgs, metrics["is_special_case"]):
+        if is_special_case:
             print("special_case detected - ", cbg)
-            special_count += 1
-        all_cbg_resilience["CBG"].append(cbg)
-        all_cbg_resilience["Resilience"].append(log_metrics["resilience"])
-        all_cbg_resilience["Robustness"].append(log_metrics["robustness"])
-        all_cbg_resilience["Vulnerability"].append(log_metrics["vulnerability"])
-        all_cbg_resilience["Status"].append(log_metrics["recovery_status"])
+    special_count = int(metrics["is_special_case"].sum())
+
+    all_cbg_resilience = {
+        "CBG": all_cbgs,
+        "Resilience": metrics["resilience"],
+        "Robustness": metrics["robustness"],
+        "Vulnerability": metrics["vulnerability"],
+        "Status": metrics["recovery_status"],
+    }
 
     print("Total no. of cbgs - ", len(all_cbgs))
     print("Total no. of special cbgs - ", special_count)
@@ -37,10 +38,7 @@ def run_batch_processing():
 
     resilience_df = pd.DataFrame(all_cbg_resilience)
     resilience_df.to_csv("cbg_resilience_summary.csv", index=False)
-
-    data = pd.read_csv('cbg_resilience_summary.csv')
-    new_data = data[data["Status"] != "No Trend Shown"]
-    new_data.to_csv('cbg_resilience_summary_filtered.csv', index=False)
+    resilience_df[resilience_df["Status"] != "No Trend Shown"].to_csv("cbg_resilience_summary_filtered.csv", index=False)
 
 if __name__ == "__main__":
     run_batch_processing()
\ No newline at end of file
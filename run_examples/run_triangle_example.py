@@ -18,7 +18,7 @@ def run_triangle_example():
     df = load_and_process_data(PATH, dataset)
     preprocess_df = preprocess_data(df, cbg)
     basline_value = calculate_baseline(preprocess_df, disaster_start)
-    log_metrics, graph_metrics = calculate_resilience_triangle_metrics(preprocess_df, basline_value, disaster_start, disaster_end)
+    log_metrics, graph_metrics = calculate_resilience_triangle_metrics(*to_model_arrays(preprocess_df), basline_value, disaster_start, disaster_end)
     log_summary_triangle(cbg = cbg, baseline_value=basline_value, disaster_name=DISASTER_NAME, **log_metrics)
     plot_resilience_graph_triangle(df = preprocess_df, baseline_value=basline_value, cbg=cbg, **graph_metrics)
 
@@ -1,37 +1,75 @@
 # resilience_models/utils.py
 
+import numbers
+
+import numpy as np
 import pandas as pd
 from datetime import datetime
 from typing import Tuple
+from numba import njit
+
+_UNIX_EPOCH_ORDINAL = datetime(1970, 1, 1).toordinal()
+
+def days_between(start_date, end_date) -> int:
+    """
+    Whole days from start_date to end_date, as an int64 subtraction of day numbers.
+    Dates may be pd.Timestamp, np.datetime64 or int day numbers.
+    """
+    return to_day_number(end_date) - to_day_number(start_date)
+
+@njit(cache=True)
+def _calculate_slope_nb(x1: float, y1: float, x2: float, y2: float) -> float:
+    """
+    Absolute slope between (x1, y1) and (x2, y2); 0 for a vertical line.
+    """
+    if x1 == x2:
+        return 0.0
+    return abs((y2 - y1) / (x2 - x1))
+
+@njit(cache=True)
+def _triangle_area_nb(x1: float, y1: float, x2: float, y2: float, x3: float, y3: float) -> float:
+    """
+    Area of the triangle (x1, y1), (x2, y2), (x3, y3) as half the cross product of the edges from (x1, y1).
+    """
+    return 0.5 * abs((x2 - x1) * (y3 - y1) - (x3 - x1) * (y2 - y1))
+
+@njit(cache=True)
+def _area_under_baseline_nb(days: float, baseline_value: float) -> float:
+    """
+    Area of the rectangle under a constant baseline over a number of days.
+    """
+    return days * baseline_value
 
 def calculate_slope(point1: Tuple[datetime, float], point2: Tuple[datetime, float]) -> float:
     """
     Calculates the absolute slope between two points.
-    Points should be (date, value) tuples.
+    Points should be (date, value) tuples. x may also be a plain number (e.g. a day number or a
+    fractional day offset), which is used as-is.
 
     Args:
         point1 (Tuple[datetime, float]): The first point (x1, y1) where x is a datetime object.
         point2 (Tuple[datetime, float]): The second point (x2, y2) where x is a datetime object.
 
     Returns:
-        float: The absolute slope. Returns 1 if x1 equals x2 to avoid division by zero.
+        float: The absolute slope per day. Returns 0 if x1 equals x2 to avoid division by zero.
     """
     x1, y1 = point1
     x2, y2 = point2
-    
-    # Convert datetime objects to days for slope calculation
-    x1_days = (x1 - datetime(x1.year, 1, 1)).days if isinstance(x1, datetime) else x1
-    x2_days = (x2 - datetime(x2.year, 1, 1)).days if isinstance(x2, datetime) else x2
 
-    if x1_days == x2_days:
-        return 0
-    else:
-        slope = (y2 - y1) / (x2_days - x1_days)
-        return abs(slope)
+    # Day numbers rather than dates, so the slope is also correct across a year boundary
+    return _calculate_slope_nb(_slope_x(x1), float(y1), _slope_x(x2), float(y2))
+
+def _slope_x(x) -> float:
+    """
+    x coordinate for calculate_slope: real numbers pass through unchanged, dates become day numbers.
+    """
+    if isinstance(x, numbers.Real): # int, float, np.integer, np.floating
+        return float(x)
+    return float(to_day_number(x))
 
 def calculate_triangle_area(point1: Tuple[int, float], point2: Tuple[int, float], point3: Tuple[int, float]) -> float:
     """
-    Calculates the area of a triangle given three points using the shoelace formula.
+    Calculates the area of a triangle given three points using the cross-product (shoelace) formula.
     Points should be (date, in_degree) tuples.
 
     Args:
@@ -47,8 +85,26 @@ def calculate_triangle_area(point1: Tuple[int, float], point2: Tuple[int, float]
     x2, y2 = point2[0], point2[1]
     x3, y3 = point3[0], point3[1]
 
-    area = 0.5 * abs(x1 * (y2 - y3) + x2 * (y3 - y1) + x3 * (y1 - y2))
-    return area
+    return _triangle_area_nb(float(x1), float(y1), float(x2), float(y2), float(x3), float(y3))
+
+def calculate_triangle_area_batch(point1: np.ndarray, point2: np.ndarray, point3: np.ndarray) -> np.ndarray:
+    """
+    Vectorized calculate_triangle_area for N triangles at once.
+
+    Args:
+        point1 (np.ndarray): (N, 2) array of first vertices (x1, y1).
+        point2 (np.ndarray): (N, 2) array of second vertices (x2, y2).
+        point3 (np.ndarray): (N, 2) array of third vertices (x3, y3).
+
+    Returns:
+        np.ndarray: (N,) array with the area of each triangle.
+    """
+    point1, point2, point3 = (np.asarray(p, dtype=np.float64) for p in (point1, point2, point3))
+    e2 = point2 - point1
+    e3 = point3 - point1
+
+    # 2D cross product of the edges, written out: np.cross on 2-vectors is deprecated in NumPy 2.
+    return 0.5 * np.abs(e2[:, 0] * e3[:, 1] - e3[:, 0] * e2[:, 1])
 
 def get_area_under_baseline(baseline_value: float, start_date: pd.Timestamp, end_date: pd.Timestamp) -> float:
     """
@@ -56,17 +112,50 @@ def get_area_under_baseline(baseline_value: float, start_date: pd.Timestamp, end
 
     Args:
         baseline_value (float): The constant baseline value.
-        start_date (pd.Timestamp): The start date of the period.
-        end_date (pd.Timestamp): The end date of the period.
+        start_date (pd.Timestamp): The start date of the period (or its day number).
+        end_date (pd.Timestamp): The end date of the period (or its day number).
 
     Returns:
         float: The calculated area.
     """
-    return (end_date - start_date).days * baseline_value
+    return _area_under_baseline_nb(float(days_between(start_date, end_date)), float(baseline_value))
+
+def get_area_under_baseline_vec(baseline: np.ndarray, start: pd.Series, end: pd.Series) -> np.ndarray:
+    """
+    Vectorized get_area_under_baseline over many (baseline, start, end) windows.
+
+    Args:
+        baseline (np.ndarray): The baseline value of each window (or one value for all).
+        start (pd.Series): The start date of each window.
+        end (pd.Series): The end date of each window.
+
+    Returns:
+        np.ndarray: The area under the baseline of each window.
+    """
+    return get_area_under_baseline_batch(baseline, start, end)
+
+def get_area_under_baseline_batch(baselines: np.ndarray, start_days: np.ndarray, end_days: np.ndarray) -> np.ndarray:
+    """
+    get_area_under_baseline over many windows given as int64 day numbers (e.g. from to_day_number or to_model_arrays).
+    Datetime-like input (DatetimeIndex, Series or datetime64 arrays of any unit) is converted to day numbers
+    first, so no nanosecond assumption is made; then a single subtract and multiply over the whole batch.
+
+    Args:
+        baselines (np.ndarray): The baseline value of each window (or one value for all).
+        start_days (np.ndarray): The start day number (or date) of each window.
+        end_days (np.ndarray): The end day number (or date) of each window.
+
+    Returns:
+        np.ndarray: The area under the baseline of each window.
+    """
+    days = _as_c_days(end_days) - _as_c_days(start_days) # integer day numbers pass through unchanged
+    return days * np.asarray(baselines, dtype=np.float64)
 
 def get_relative_points(point1: Tuple[pd.Timestamp, float], point2: Tuple[pd.Timestamp, float], point3: Tuple[pd.Timestamp, float]) -> Tuple[Tuple[int, float], Tuple[int, float], Tuple[int, float]]:
     """
     Converts absolute datetime points to relative days from the first point.
+    Dates may be pd.Timestamp, np.datetime64 (e.g. elements of a datetime64[D] array) or day numbers;
+    np.datetime64 and day numbers are subtracted as int64 without any pandas boxing.
 
     Args:
         point1 (Tuple[pd.Timestamp, float]): The reference point (t0).
@@ -78,6 +167,226 @@ def get_relative_points(point1: Tuple[pd.Timestamp, float], point2: Tuple[pd.Tim
             A tuple containing three new points (days_relative_to_t0, value).
     """
     point_r1 = (0, point1[1])
-    point_r2 = ((point2[0]-point1[0]).days, point2[1])
-    point_r3 = ((point3[0]-point1[0]).days, point3[1])
-    return (point_r1, point_r2, point_r3)
\ No newline at end of file
+    point_r2 = (days_between(point1[0], point2[0]), point2[1])
+    point_r3 = (days_between(point1[0], point3[0]), point3[1])
+    return (point_r1, point_r2, point_r3)
+
+def get_relative_points_vec(t0: np.ndarray, tD: np.ndarray, t1: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized get_relative_points over many (t0, tD, t1) triples: only the day offsets are
+    computed, since the values are unchanged and the t0 offset is always 0.
+
+    Args:
+        t0 (np.ndarray): The reference dates (datetime64 values or a datetime Series).
+        tD (np.ndarray): The systematic impact dates.
+        t1 (np.ndarray): The recovery dates.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: int64 days from t0 to tD, and from t0 to t1.
+    """
+    t0_days = _as_c_days(t0)
+    return _as_c_days(tD) - t0_days, _as_c_days(t1) - t0_days
+
+@njit(cache=True)
+def centered_rolling_mean(x: np.ndarray, window: int) -> np.ndarray:
+    """
+    Centered moving average of a 1D float64 array using a running sum.
+    Equivalent to pd.Series(x).rolling(window, center=True, min_periods=1).mean():
+    the window shrinks at the edges and NaNs are skipped.
+
+    Args:
+        x (np.ndarray): The float64 values to smooth.
+        window (int): The window size for the rolling mean.
+
+    Returns:
+        np.ndarray: The smoothed values. NaN only where the whole window is NaN.
+    """
+    n = x.shape[0]
+    out = np.empty(n, dtype=np.float64)
+    left = window // 2
+    right = window - left - 1
+
+    total = 0.0
+    count = 0
+    for j in range(min(right + 1, n)):
+        if not np.isnan(x[j]):
+            total += x[j]
+            count += 1
+
+    for i in range(n):
+        out[i] = total / count if count > 0 else np.nan
+        j = i + right + 1
+        if j < n and not np.isnan(x[j]):
+            total += x[j]
+            count += 1
+        j = i - left
+        if j >= 0 and not np.isnan(x[j]):
+            total -= x[j]
+            count -= 1
+    return out
+
+@njit(cache=True)
+def grouped_centered_rolling_mean(x: np.ndarray, starts: np.ndarray, stops: np.ndarray, window: int) -> np.ndarray:
+    """
+    Applies centered_rolling_mean independently to each contiguous [start, stop) block of x.
+
+    Args:
+        x (np.ndarray): The float64 values to smooth.
+        starts (np.ndarray): Start index of each block.
+        stops (np.ndarray): Stop index (exclusive) of each block.
+        window (int): The window size for the rolling mean.
+
+    Returns:
+        np.ndarray: The smoothed values.
+    """
+    out = np.empty_like(x)
+    for g in range(starts.shape[0]):
+        out[starts[g]:stops[g]] = centered_rolling_mean(x[starts[g]:stops[g]], window)
+    return out
+
+@njit(cache=True)
+def window_nanmean(x: np.ndarray, days: np.ndarray, first_day: int, last_day: int) -> float:
+    """
+    Mean of the non-NaN values of x whose day falls in [first_day, last_day], like
+    Series.mean over that date window. The sum runs left to right, so every caller gets the same rounding.
+
+    Args:
+        x (np.ndarray): The float64 values.
+        days (np.ndarray): The matching sorted int64 day numbers.
+        first_day (int): First day of the window.
+        last_day (int): Last day of the window (inclusive).
+
+    Returns:
+        float: The mean, or NaN if the window holds no non-NaN values.
+    """
+    lo = np.searchsorted(days, first_day, side="left")
+    hi = np.searchsorted(days, last_day, side="right")
+    total = 0.0
+    count = 0
+    for j in range(lo, hi):
+        if not np.isnan(x[j]):
+            total += x[j]
+            count += 1
+    return total / count if count else np.nan
+
+@njit(cache=True)
+def grouped_window_nanmean(x: np.ndarray, days: np.ndarray, starts: np.ndarray, stops: np.ndarray,
+                           first_day: int, last_day: int) -> np.ndarray:
+    """
+    Applies window_nanmean independently to each contiguous [start, stop) block of x.
+
+    Returns:
+        np.ndarray: One mean per block.
+    """
+    out = np.empty(starts.shape[0], dtype=np.float64)
+    for g in range(starts.shape[0]):
+        out[g] = window_nanmean(x[starts[g]:stops[g]], days[starts[g]:stops[g]], first_day, last_day)
+    return out
+
+# Compile (or load from cache) at import so the first CBG doesn't pay for it.
+centered_rolling_mean(np.zeros(2), 1)
+grouped_centered_rolling_mean(np.zeros(2), np.zeros(1, dtype=np.int64), np.full(1, 2, dtype=np.int64), 1)
+window_nanmean(np.zeros(1), np.zeros(1, dtype=np.int64), 0, 0)
+grouped_window_nanmean(np.zeros(1), np.zeros(1, dtype=np.int64), np.zeros(1, dtype=np.int64), np.ones(1, dtype=np.int64), 0, 0)
+
+def date_searchsorted(dates: np.ndarray, date: pd.Timestamp, side: str = "left") -> int:
+    """
+    Finds the insertion index of a date in a sorted datetime64 array with a binary search.
+
+    Args:
+        dates (np.ndarray): Sorted datetime64 values (e.g. df['date'].to_numpy()).
+        date (pd.Timestamp): The date to locate.
+        side (str): 'left' or 'right', as in np.searchsorted.
+
+    Returns:
+        int: The insertion index.
+    """
+    return int(dates.searchsorted(np.datetime64(date).astype(dates.dtype), side=side))
+
+@njit(cache=True)
+def nearest_index(values: np.ndarray, target: int) -> int:
+    """
+    Finds the index of the value in a sorted array closest to a target (e.g. a day number).
+    Ties resolve to the earlier value, like Series.idxmin on the absolute difference.
+
+    Args:
+        values (np.ndarray): Sorted values.
+        target (int): The value to look up.
+
+    Returns:
+        int: The index of the nearest value.
+    """
+    idx = np.searchsorted(values, target)
+    if idx == len(values) or (idx > 0 and target - values[idx - 1] <= values[idx] - target):
+        idx -= 1
+    return idx
+
+@njit(cache=True)
+def nanargmin_range(values: np.ndarray, lo: int, hi: int) -> int:
+    """
+    Index of the smallest non-NaN value in values[lo:hi], found by position rather than by
+    looking the minimum value up again. Ties resolve to the earlier index, like np.nanargmin.
+
+    Args:
+        values (np.ndarray): float64 values.
+        lo (int): First index of the range.
+        hi (int): Index after the last one in the range.
+
+    Returns:
+        int: The absolute index of the minimum, or -1 if the range is empty or all NaN.
+    """
+    best = -1
+    for j in range(lo, hi):
+        if not np.isnan(values[j]) and (best < 0 or values[j] < values[best]):
+            best = j
+    return best
+
+@njit(cache=True)
+def nanargmax_range(values: np.ndarray, lo: int, hi: int) -> int:
+    """
+    Index of the largest non-NaN value in values[lo:hi]; see nanargmin_range.
+
+    Returns:
+        int: The absolute index of the maximum, or -1 if the range is empty or all NaN.
+    """
+    best = -1
+    for j in range(lo, hi):
+        if not np.isnan(values[j]) and (best < 0 or values[j] > values[best]):
+            best = j
+    return best
+
+def to_day_number(date: pd.Timestamp) -> int:
+    """
+    Converts a date to its day number (days since 1970-01-01). Day numbers are returned unchanged.
+    Raises ValueError for a missing date (None/NaT).
+    """
+    if isinstance(date, datetime): # includes pd.Timestamp; plain int arithmetic, no datetime64 boxing
+        return date.toordinal() - _UNIX_EPOCH_ORDINAL
+    if isinstance(date, (int, np.integer)):
+        return int(date)
+    if isinstance(date, np.datetime64): # e.g. an element of a datetime64[D] array; a single int64 cast
+        day = date.astype("datetime64[D]")
+    else:
+        day = np.datetime64(date, "D")
+    if np.isnat(day): # e.g. None, "NaT" or np.datetime64("NaT"); NaT's int would pass as a valid day number
+        raise ValueError(f"Cannot convert {date!r} to a day number.")
+    return int(day.astype(np.int64))
+
+def from_day_number(day: int) -> pd.Timestamp:
+    """
+    Converts a day number (days since 1970-01-01) back to a pd.Timestamp.
+    """
+    return pd.Timestamp(np.datetime64(int(day), "D"))
+
+def _as_c_f64(s: pd.Series) -> np.ndarray:
+    """
+    Materializes a Series as a C-contiguous float64 array (no copy if it already is one).
+    """
+    return np.ascontiguousarray(s.to_numpy(), dtype=np.float64)
+
+def _as_c_days(s) -> np.ndarray:
+    """
+    Materializes datetimes (Series, DatetimeIndex or datetime64 array) as a C-contiguous int64 array of day numbers.
+    Integer arrays are taken to be day numbers already.
+    """
+    return np.ascontiguousarray(np.asarray(s).astype("datetime64[D]").view(np.int64))
\ No newline at end of file
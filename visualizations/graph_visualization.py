@@ -1,7 +1,79 @@
+import os
+import sys
+
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-from matplotlib.lines import Line2D
-from typing import List, Tuple, Dict, Optional
+from typing import TYPE_CHECKING, List, Tuple, Dict, Optional
+
+from utils import date_searchsorted
+
+if TYPE_CHECKING:
+    import matplotlib.pyplot as plt
+    from matplotlib.lines import Line2D
+
+_EVENT_STYLES_TRIANGLE = {
+    'disaster_start': ('darkred', 'left'),
+    'disaster_end': ('orangered', 'right'),
+    'systematic_impact': ('purple', 'center'),
+    'recovery': ('darkgreen', 'right')
+}
+
+_EVENT_STYLES_AUC = {
+    'disaster_start': ('darkred', 'left'),
+    'disaster_end': ('orangered', 'right'),
+    'recovery': ('darkgreen', 'right')
+}
+
+_DEFAULT_EVENT_STYLE = ('black', 'center')
+
+# How much of the series before the disaster start is plotted.
+_PRE_DISASTER_WINDOW_DAYS = pd.Timedelta(days=30)
+
+_LEGEND_PROXY_CACHE: Dict[Tuple[str, str], "Line2D"] = {}
+
+
+def _pyplot():
+    """
+    Imports matplotlib.pyplot on first use, so importing this module (e.g. for metric-only runs)
+    does not load matplotlib. On a headless host with no backend chosen, Agg is selected first
+    instead of letting pyplot probe GUI toolkits.
+    """
+    if "matplotlib.pyplot" not in sys.modules:
+        import matplotlib
+        if (not os.environ.get("MPLBACKEND") and sys.platform.startswith("linux")
+                and not os.environ.get("DISPLAY") and not os.environ.get("WAYLAND_DISPLAY")):
+            matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def _get_legend_proxy(color: str, label: str) -> "Line2D":
+    """
+    Returns a dashed Line2D legend proxy for the given color and label, reusing one per (color, label).
+    The proxy is never added to an axes, so it can be shared across figures.
+    """
+    key = (color, label)
+    proxy = _LEGEND_PROXY_CACHE.get(key)
+    if proxy is None:
+        from matplotlib.lines import Line2D
+        proxy = Line2D([0], [0], color=color, linestyle="--", label=label)
+        _LEGEND_PROXY_CACHE[key] = proxy
+    return proxy
+
+
+def _finish_figure(fig: "plt.Figure", owns_figure: bool, save_path: Optional[str]) -> None:
+    """
+    Saves, shows or redraws a finished plot. Figures created by the plot function itself are closed
+    after saving so pyplot's figure registry does not grow across many CBGs; caller-supplied ones are left open.
+    """
+    if save_path:
+        fig.savefig(save_path, dpi=100, bbox_inches='tight')
+        if owns_figure:
+            _pyplot().close(fig)
+    elif owns_figure:
+        _pyplot().show()
+    else:
+        fig.canvas.draw_idle()
 
 def plot_resilience_graph_triangle(
     df: pd.DataFrame,
@@ -16,13 +88,15 @@ def plot_resilience_graph_triangle(
     resilience_triangle: bool = True,
     critical_show: bool = True,
     title: str = "Community Resilience (Disaster Impact & Recovery) - Triangle Model",
-    cbg: Optional[str] = None
+    cbg: Optional[str] = None,
+    ax: Optional["plt.Axes"] = None,
+    save_path: Optional[str] = None
 ) -> None:
     """
     Plots the resilience graph for the Resilience Triangle model.
 
     Args:
-        df (pd.DataFrame): DataFrame with normalized 'in_degree' and 'date'.
+        df (pd.DataFrame): DataFrame with normalized 'in_degree' and 'date', sorted by 'date'.
         triangle_coordinates (Optional[List[Tuple[pd.Timestamp, float]]]): List of (date, value) tuples for the triangle vertices (t0, tD, t1).
         disaster_region (Tuple[pd.Timestamp, pd.Timestamp]): Tuple (disaster_start, disaster_end) for the disaster span.
         dab_region (Optional[Tuple[pd.Timestamp, pd.Timestamp]]): Tuple (t0, t1) for the Area Under Baseline fill.
@@ -35,24 +109,36 @@ def plot_resilience_graph_triangle(
         critical_show (bool): Whether to show critical event vertical lines and legend entries.
         title (str): Title of the plot.
         cbg (Optional[str]): CBG identifier to include in the title.
+        ax (Optional[plt.Axes]): Existing axes to draw on (cleared first), e.g. when plotting many CBGs
+            in a loop. If None, a new figure is created and shown.
+        save_path (Optional[str]): If given, the figure is saved there instead of being shown.
     """
-    mask = (df['date'] >= disaster_region[0] - pd.Timedelta(days=30))
-    plot_df = df.loc[mask].copy()
+    all_dates = df['date'].to_numpy()
+    cut = date_searchsorted(all_dates, disaster_region[0] - _PRE_DISASTER_WINDOW_DAYS)
+    dates = all_dates[cut:]
+    in_degree = df['in_degree'].to_numpy()[cut:]
 
-    xmax = plot_df['date'].max()
-    xmin = plot_df['date'].min()
+    xmax = dates.max()
+    xmin = dates.min()
 
-    fig, ax = plt.subplots(figsize=(15, 8))
+    owns_figure = ax is None
+    if owns_figure:
+        fig, ax = _pyplot().subplots(figsize=(15, 8))
+    else:
+        ax.clear()
+        fig = ax.figure
 
-    ax.plot(plot_df['date'], plot_df['in_degree'], color='black', linewidth=2, label='Normalized Mobility')
+    ax.plot(dates, in_degree, color='black', linewidth=2, label='Normalized Mobility')
 
     if plot_baseline:
         ax.hlines(y=baseline_value, xmin=xmin, xmax=xmax, colors='blue', linestyles='--', linewidth=2, label='Baseline')
 
     if fill_dab and dab_region:
-        green_df = df[(df['date'] >= dab_region[0]) & (df['date'] <= dab_region[1])]
+        lo = date_searchsorted(all_dates, dab_region[0])
+        hi = date_searchsorted(all_dates, dab_region[1], side='right')
+        green_dates = all_dates[lo:hi]
         ax.fill_between(
-            green_df['date'],
+            green_dates,
             0,
             baseline_value,
             color='green',
@@ -61,8 +147,9 @@ def plot_resilience_graph_triangle(
         )
 
     if resilience_triangle and triangle_coordinates and len(triangle_coordinates) == 3:
-        x_triangle = [p[0] for p in triangle_coordinates]
-        y_triangle = [p[1] for p in triangle_coordinates]
+        (p1, p2, p3) = triangle_coordinates
+        x_triangle = (p1[0], p2[0], p3[0])
+        y_triangle = (p1[1], p2[1], p3[1])
         ax.fill(x_triangle, y_triangle, facecolor='orange', alpha=0.3, label='Resilience Triangle')
         ax.scatter(x_triangle, y_triangle, color='orange', zorder=5)
 
@@ -71,18 +158,14 @@ def plot_resilience_graph_triangle(
 
     if critical_show and critical_events:
         plot_handles, plot_labels = ax.get_legend_handles_labels()
-        event_styles = {
-            'disaster_start': ('darkred', 'left'),
-            'disaster_end': ('orangered', 'right'),
-            'systematic_impact': ('purple', 'center'),
-            'recovery': ('darkgreen', 'right')
-        }
-
-        event_handles = []
-        for label, date in critical_events.items():
-            color, align = event_styles.get(label, ('black', 'center'))
-            ax.axvline(x=date, linestyle='--', color=color, linewidth=1.5)
-            event_handles.append(Line2D([0], [0], color=color, linestyle="--", label=label.replace('_', ' ').title()))
+        event_colors = [_EVENT_STYLES_TRIANGLE.get(label, _DEFAULT_EVENT_STYLE)[0] for label in critical_events]
+        # One LineCollection spanning the full axes height, instead of one axvline artist per event.
+        ax.vlines(list(critical_events.values()), 0, 1, transform=ax.get_xaxis_transform(),
+                  colors=event_colors, linestyles='--', linewidth=1.5)
+        event_handles = [
+            _get_legend_proxy(color, label.replace('_', ' ').title())
+            for label, color in zip(critical_events, event_colors)
+        ]
 
         all_handles = plot_handles + event_handles
         all_labels = plot_labels + list(critical_events.keys())
@@ -97,9 +180,9 @@ def plot_resilience_graph_triangle(
     ax.set_ylabel("Normalized Mobility", fontsize=12)
     ax.set_ylim(0, 1.1)
     ax.grid(True)
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    plt.show()
+    ax.tick_params(axis='x', labelrotation=45)
+    fig.tight_layout()
+    _finish_figure(fig, owns_figure, save_path)
 
 def plot_resilience_graph_auc(
     df: pd.DataFrame,
@@ -110,13 +193,15 @@ def plot_resilience_graph_auc(
     disaster_span: bool = True,
     critical_show: bool = True,
     title: str = "Community Resilience (Disaster Impact & Recovery) - AUC Model",
-    cbg: Optional[str] = None
+    cbg: Optional[str] = None,
+    ax: Optional["plt.Axes"] = None,
+    save_path: Optional[str] = None
 ) -> None:
     """
     Plots the resilience graph for the AUC model.
 
     Args:
-        df (pd.DataFrame): DataFrame with baseline-normalized 'in_degree' and 'date'.
+        df (pd.DataFrame): DataFrame with baseline-normalized 'in_degree' and 'date', sorted by 'date'.
         disaster_region (Tuple[pd.Timestamp, pd.Timestamp]): Tuple (disaster_start, disaster_end) for the disaster span.
         resilience_region (Tuple[pd.Timestamp, pd.Timestamp]): Tuple (disaster_start, recovery_point) for the resilience area fill.
         critical_events (Optional[Dict[str, pd.Timestamp]]): Dictionary of critical event labels and their dates.
@@ -125,28 +210,40 @@ def plot_resilience_graph_auc(
         critical_show (bool): Whether to show critical event vertical lines and legend entries.
         title (str): Title of the plot.
         cbg (Optional[str]): CBG identifier to include in the title.
+        ax (Optional[plt.Axes]): Existing axes to draw on (cleared first), e.g. when plotting many CBGs
+            in a loop. If None, a new figure is created and shown.
+        save_path (Optional[str]): If given, the figure is saved there instead of being shown.
     """
-    mask = (df['date'] >= disaster_region[0] - pd.Timedelta(days=30))
-    plot_df = df.loc[mask].copy()
+    all_dates = df['date'].to_numpy()
+    cut = date_searchsorted(all_dates, disaster_region[0] - _PRE_DISASTER_WINDOW_DAYS)
+    dates = all_dates[cut:]
+    in_degree = df['in_degree'].to_numpy()[cut:]
 
-    max_val = plot_df['in_degree'].abs().max()
+    max_val = df['in_degree'].iloc[cut:].abs().max()
     y_limit = max_val if pd.notna(max_val) else 1.0
 
-    fig, ax = plt.subplots(figsize=(15, 8))
+    owns_figure = ax is None
+    if owns_figure:
+        fig, ax = _pyplot().subplots(figsize=(15, 8))
+    else:
+        ax.clear()
+        fig = ax.figure
     ax.set_ylim(-y_limit * 1.1, y_limit * 1.1)
 
-    ax.plot(plot_df['date'], plot_df['in_degree'], color='black', linewidth=2, label='Normalized Mobility')
+    ax.plot(dates, in_degree, color='black', linewidth=2, label='Normalized Mobility')
     ax.axhline(y=0, color='gray', linestyle='-', linewidth=1.5, alpha=0.8)
 
     if fill_region:
-        fill_mask = (plot_df['date'] >= resilience_region[0]) & (plot_df['date'] <= resilience_region[1])
-        fill_df = plot_df.loc[fill_mask].copy() # Ensure copy to avoid SettingWithCopyWarning
+        lo = date_searchsorted(dates, resilience_region[0])
+        hi = date_searchsorted(dates, resilience_region[1], side='right')
+        fill_dates = dates[lo:hi]
+        fill_in_degree = in_degree[lo:hi]
 
         ax.fill_between(
-            fill_df['date'],
-            fill_df['in_degree'],
+            fill_dates,
+            fill_in_degree,
             0,  # x-axis baseline
-            where=(~fill_df['in_degree'].isna()),
+            where=~np.isnan(fill_in_degree),
             interpolate=True,
             color='orange',
             alpha=0.3,
@@ -158,17 +255,14 @@ def plot_resilience_graph_auc(
 
     if critical_show and critical_events:
         plot_handles, plot_labels = ax.get_legend_handles_labels()
-        event_styles = {
-            'disaster_start': ('darkred', 'left'),
-            'disaster_end': ('orangered', 'right'),
-            'recovery': ('darkgreen', 'right')
-        }
-
-        event_handles = []
-        for label, date in critical_events.items():
-            color, align = event_styles.get(label, ('black', 'center'))
-            ax.axvline(x=date, linestyle='--', color=color, linewidth=1.5)
-            event_handles.append(Line2D([0], [0], color=color, linestyle="--", label=label.replace('_', ' ').title()))
+        event_colors = [_EVENT_STYLES_AUC.get(label, _DEFAULT_EVENT_STYLE)[0] for label in critical_events]
+        # One LineCollection spanning the full axes height, instead of one axvline artist per event.
+        ax.vlines(list(critical_events.values()), 0, 1, transform=ax.get_xaxis_transform(),
+                  colors=event_colors, linestyles='--', linewidth=1.5)
+        event_handles = [
+            _get_legend_proxy(color, label.replace('_', ' ').title())
+            for label, color in zip(critical_events, event_colors)
+        ]
 
         all_handles = plot_handles + event_handles
         all_labels = plot_labels + list(critical_events.keys())
@@ -182,6 +276,6 @@ def plot_resilience_graph_auc(
     ax.set_xlabel("Date", fontsize=12)
     ax.set_ylabel("Normalized Mobility", fontsize=12)
     ax.grid(True)
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    plt.show()
\ No newline at end of file
+    ax.tick_params(axis='x', labelrotation=45)
+    fig.tight_layout()
+    _finish_figure(fig, owns_figure, save_path)
\ No newline at end of file
@@ -1,7 +1,98 @@
+import math
+import sys
 from typing import Optional
 
 import pandas as pd
 
+try:
+    import orjson
+
+    def _dumps(record: dict) -> bytes:
+        return orjson.dumps(record)
+except ImportError:
+    import json
+
+    def _dumps(record: dict) -> bytes:
+        return json.dumps(record, separators=(",", ":")).encode()
+
+_TRIANGLE_TEMPLATE = """
+======================================================================
+📍 Community Resilience Summary for CBG - {cbg} - {disaster_name}
+======================================================================
+🗓️  Disaster Timeline:
+   • Start: {start_date}
+   • End  : {end_date}
+----------------------------------------------------------------------
+⏱️  Key Resilience Markers:
+   • t0         (Disaster Start)    : {point_t0}
+   • t_inactive (Disaster End)    : {point_inactive}
+   • tD         (Systematic Impact)    : {point_tD}
+   • t1         (Recovery Detected) : {point_t1}
+----------------------------------------------------------------------
+📉 Baseline Value         : {baseline_value:.4f}
+----------------------------------------------------------------------
+📊 Resilience Metrics:
+   • 🛡️  Robustness     : {robustness:.4f}
+   • ⚠️  Vulnerability  : {vulnerability:.4f}
+   • 🔁  Resilience      : {resilience:.4f} %
+----------------------------------------------------------------------
+Recovery Status: {recovery_status}
+{special_case}======================================================================
+
+"""
+
+_AUC_TEMPLATE = """
+Community Resilience Summary for {cbg} - {disaster_name}
+-----------------------------
+Disaster Start Date    : {disaster_start}
+Disaster End Date      : {disaster_end}
+Recovery Point         : {recovery_point}
+Time to Recovery       : {recovery_days} days
+Resilience Capacity    : {resilience:.3f} (area under normalized curve)
+{special_case}"""
+
+_SPECIAL_CASE_TEMPLATE = "Special Case - {message}\n"
+
+
+def _iso_date(ts) -> str:
+    """Formats a date as YYYY-MM-DD from its fields, without going through strftime."""
+    return f"{ts.year:04d}-{ts.month:02d}-{ts.day:02d}"
+
+
+def _json_date(ts) -> Optional[str]:
+    """YYYY-MM-DD for a date, None for a missing one (None/NaT)."""
+    return None if ts is None or pd.isna(ts) else _iso_date(ts)
+
+
+def _json_float(x) -> Optional[float]:
+    """Plain float for JSON, None for a missing value (None/NaN)."""
+    return None if x is None or math.isnan(x) else float(x)
+
+
+def _json_days(start, end) -> Optional[int]:
+    """Whole days from start to end, None if either date is missing (None/NaT)."""
+    if start is None or end is None or pd.isna(start) or pd.isna(end):
+        return None
+    return (end - start).days
+
+
+def _text_or_na(value) -> str:
+    """Value as text for the readable summary, "N/A" if it is missing."""
+    return "N/A" if value is None else str(value)
+
+
+def _emit_json(record: dict) -> None:
+    """
+    Writes one JSON line to stdout, straight to the byte buffer when there is one.
+    """
+    line = _dumps(record) + b"\n"
+    buffer = getattr(sys.stdout, "buffer", None)
+    if buffer is None: # e.g. stdout redirected to a StringIO
+        sys.stdout.write(line.decode())
+    else:
+        sys.stdout.flush() # keep ordering with earlier text writes
+        buffer.write(line)
+
 
 def log_summary_triangle(
     cbg: str,
@@ -16,7 +107,8 @@ def log_summary_triangle(
     disaster_name: Optional[str] = None,
     recovery_status: str = "Recovered",
     message: str = None,
-    is_special_case: bool = False
+    is_special_case: bool = False,
+    verbose: bool = True
 ) -> None:
     """
     Logs a summary of the community resilience analysis (for Triangle model).
@@ -24,8 +116,6 @@ def log_summary_triangle(
     Args:
         :param cbg: The Census Block Group identifier.
         :param disaster_name: The name of the disaster.
-        :param disaster_start: The start date of the disaster.
-        :param disaster_end: The end date of the disaster.
         :param point_t0: Disaster start marker.
         :param point_inactive: Disaster end marker.
         :param point_tD: Systematic impact marker.
@@ -34,42 +124,29 @@ def log_summary_triangle(
         :param resilience: The calculated resilience percentage.
         :param robustness: The calculated robustness value.
         :param vulnerability: The calculated vulnerability value.
-        :param recovery_status: True if the CBG recovered, False otherwise.
+        :param recovery_status: Recovery label: "Recovered", "New normal" or "No Trend Shown".
         :param message: An optional message for special cases.
         :param is_special_case: True if a special case (e.g., error) occurred.
+        :param verbose: If True, writes the human-readable summary; if False, one JSON line (e.g. for batch runs).
     """
-    print("\n" + "="*70)
-    print(f"📍 Community Resilience Summary for CBG - {cbg} - {disaster_name}")
-
-    print("="*70)
-
-    print(f"🗓️  Disaster Timeline:")
-    print(f"   • Start: {point_t0.strftime('%Y-%m-%d')}")
-    print(f"   • End  : {point_inactive.strftime('%Y-%m-%d')}")
-
-    print("-" * 70)
-    print(f"⏱️  Key Resilience Markers:")
-    print(f"   • t0         (Disaster Start)    : {point_t0}")
-    print(f"   • t_inactive (Disaster End)    : {point_inactive}")
-    print(f"   • tD         (Systematic Impact)    : {point_tD}")
-    print(f"   • t1         (Recovery Detected) : {point_t1}")
-
-    print("-" * 70)
-    print(f"📉 Baseline Value         : {baseline_value:.4f}")
-
-    print("-" * 70)
-    print(f"📊 Resilience Metrics:")
-    print(f"   • 🛡️  Robustness     : {robustness:.4f}")
-    print(f"   • ⚠️  Vulnerability  : {vulnerability:.4f}")
-    print(f"   • 🔁  Resilience      : {resilience:.4f} %")
-
-    print("-" * 70)
-    print(f"Recovery Status: {recovery_status}")
-
-    if is_special_case:
-        print(f"Special Case - {message}")
-
-    print("="*70 + "\n")
+    if not verbose:
+        _emit_json({
+            'model': 'triangle', 'cbg': cbg, 'disaster_name': disaster_name,
+            'ts_t0': _json_date(point_t0), 'ts_inactive': _json_date(point_inactive),
+            'ts_tD': _json_date(point_tD), 'ts_t1': _json_date(point_t1),
+            'baseline_value': _json_float(baseline_value), 'robustness': _json_float(robustness),
+            'vulnerability': _json_float(vulnerability), 'resilience': _json_float(resilience),
+            'recovery_status': recovery_status, 'is_special_case': bool(is_special_case), 'message': message
+        })
+        return
+    special_case = _SPECIAL_CASE_TEMPLATE.format(message=message) if is_special_case else ""
+    sys.stdout.write(_TRIANGLE_TEMPLATE.format(
+        cbg=cbg, disaster_name=disaster_name,
+        start_date=_iso_date(point_t0), end_date=_iso_date(point_inactive),
+        point_t0=point_t0, point_inactive=point_inactive, point_tD=point_tD, point_t1=point_t1,
+        baseline_value=baseline_value, robustness=robustness, vulnerability=vulnerability, resilience=resilience,
+        recovery_status=recovery_status, special_case=special_case
+    ))
 
 def log_summary_auc(
         cbg: str,
@@ -77,9 +154,10 @@ def log_summary_auc(
         disaster_end: pd.Timestamp,
         recovery_point: pd.Timestamp,
         resilience: float,
-        is_special_case: True,
+        is_special_case: bool = False,
         disaster_name: Optional[str] = None,
-        message: str = None
+        message: str = None,
+        verbose: bool = True
         ) -> None:
     """
     Logs a summary of the community resilience analysis using AUC.
@@ -94,14 +172,21 @@ def log_summary_auc(
         is_special_case (bool): True if a special case (e.g., error) occurred.
         disaster_name: The name of the disaster.
         message (str): An optional message for special cases.
+        verbose (bool): If True, writes the human-readable summary; if False, one JSON line (e.g. for batch runs).
     """
-    print(f"\nCommunity Resilience Summary for {cbg} - {disaster_name}")
-    print("-----------------------------")
-    print(f"Disaster Start Date    : {disaster_start.strftime('%Y-%m-%d')}")
-    print(f"Disaster End Date      : {disaster_end.strftime('%Y-%m-%d')}")
-    print(f"Recovery Point         : {recovery_point.strftime('%Y-%m-%d')}")
-    print(f"Time to Recovery       : {(recovery_point - disaster_start).days} days")
-    print(f"Resilience Capacity    : {resilience:.3f} (area under normalized curve)")
-
-    if is_special_case:
-        print(f"Special Case - {message}")
\ No newline at end of file
+    if not verbose:
+        _emit_json({
+            'model': 'auc', 'cbg': cbg, 'disaster_name': disaster_name,
+            'ts_disaster_start': _json_date(disaster_start), 'ts_disaster_end': _json_date(disaster_end),
+            'ts_recovery': _json_date(recovery_point), 'recovery_days': _json_days(disaster_start, recovery_point),
+            'resilience': _json_float(resilience), 'is_special_case': bool(is_special_case), 'message': message
+        })
+        return
+    special_case = _SPECIAL_CASE_TEMPLATE.format(message=message) if is_special_case else ""
+    sys.stdout.write(_AUC_TEMPLATE.format(
+        cbg=cbg, disaster_name=disaster_name,
+        disaster_start=_iso_date(disaster_start), disaster_end=_iso_date(disaster_end),
+        recovery_point=_json_date(recovery_point) or "N/A", # None for special cases
+        recovery_days=_text_or_na(_json_days(disaster_start, recovery_point)), resilience=resilience,
+        special_case=special_case
+    ))
\ No newline at end of file